@@ -29,6 +29,9 @@ Q_CREATION_JOBS = 'create'
 Q_UPDATING_JOBS = 'update'
 Q_STORAGE_ITEMS = 'items'
 
+ITEMS_BATCH_SIZE = 500  # Items pushed to Redis per round-trip
+ITEMS_PICKLE_PROTOCOL = 4
+
 TIMEOUT = 3600 * 24
 
 WAIT_FOR_QUEUING = 10  # In seconds
@@ -21,17 +21,20 @@
 #
 
 import logging
+import queue
+import threading
 
 import pickle
 import rq
 
 import perceval
 import perceval.backend
-import perceval.backends
 import perceval.archive
 
 from ._version import __version__
+from .common import ITEMS_BATCH_SIZE, ITEMS_PICKLE_PROTOCOL
 from .errors import NotFoundError
+from .utils import available_backends
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +52,8 @@ class JobResult:
     :param backend: backend used to fetch the items
     :param category: category of the fetched items
     """
+    __slots__ = ('job_id', 'task_id', 'backend', 'category', 'summary')
+
     def __init__(self, job_id, task_id, backend, category):
         self.job_id = job_id
         self.task_id = task_id
@@ -56,27 +61,41 @@ class JobResult:
         self.category = category
         self.summary = None
 
+    def __setstate__(self, state):
+        # Objects pickled before the use of slots store their
+        # attributes in a dict; newer ones use a '(None, slots)'
+        # tuple. Both are accepted to load results from old workers.
+        if isinstance(state, tuple):
+            state = state[1]
+
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
     def to_dict(self):
         """Convert object to a dict"""
 
-        result = {
-            'job_id': self.job_id,
-            'task_id': self.task_id
-        }
+        summary = self.summary
 
-        if self.summary:
-            result['fetched'] = self.summary.fetched
-            result['skipped'] = self.summary.skipped
-            result['min_updated_on'] = self.summary.min_updated_on.timestamp()
-            result['max_updated_on'] = self.summary.max_updated_on.timestamp()
-            result['last_updated_on'] = self.summary.last_updated_on.timestamp()
-            result['last_uuid'] = self.summary.last_uuid
-            result['min_offset'] = self.summary.min_offset
-            result['max_offset'] = self.summary.max_offset
-            result['last_offset'] = self.summary.last_offset
-            result['extras'] = self.summary.extras
+        if not summary:
+            return {
+                'job_id': self.job_id,
+                'task_id': self.task_id
+            }
 
-        return result
+        return {
+            'job_id': self.job_id,
+            'task_id': self.task_id,
+            'fetched': summary.fetched,
+            'skipped': summary.skipped,
+            'min_updated_on': summary.min_updated_on.timestamp(),
+            'max_updated_on': summary.max_updated_on.timestamp(),
+            'last_updated_on': summary.last_updated_on.timestamp(),
+            'last_uuid': summary.last_uuid,
+            'min_offset': summary.min_offset,
+            'max_offset': summary.max_offset,
+            'last_offset': summary.last_offset,
+            'extras': summary.extras
+        }
 
 
 class PercevalJob:
@@ -92,25 +111,40 @@ class PercevalJob:
     :param backend: name of the backend to execute
     :param conn: connection with a Redis database
     :param qitems: name of the queue where items will be stored
+    :param batch_size: maximum number of items sent to Redis on
+        each round-trip
 
     :rasises NotFoundError: raised when the backend is not available
         in Perceval
+    :raises ValueError: raised when `batch_size` is lower than 1
     """
-    def __init__(self, job_id, task_id, backend, category, conn, qitems):
+    def __init__(self, job_id, task_id, backend, category, conn, qitems,
+                 batch_size=ITEMS_BATCH_SIZE):
         try:
-            self._bklass = perceval.backend.find_backends(perceval.backends)[0][backend]
+            self._bklass = available_backends()[backend]
         except KeyError:
             raise NotFoundError(element=backend)
 
+        if batch_size is None or batch_size < 1:
+            raise ValueError("Batch size must be greater than 0")
+
         self.job_id = job_id
         self.task_id = task_id
         self.backend = backend
         self.conn = conn
         self.qitems = qitems
+        self.batch_size = batch_size
         self.archive_manager = None
         self.category = category
 
+        self._item_metadata = {
+            'arthur_version': __version__,
+            'job_id': self.job_id
+        }
+
         self._big = None  # items generator
+        self._error = None  # error raised by the items writer
+        self._stored_summary = None  # summary of the items stored
         self._result = JobResult(self.job_id, self.task_id,
                                  self.backend, self.category)
 
@@ -139,6 +173,19 @@ class PercevalJob:
         status of the job, can be accessed through the property
         `result`.
 
+        Items are serialized and sent to Redis by a writer thread,
+        so fetching and storing run at the same time. The writer
+        sends the items in batches of up to `batch_size` elements
+        with a single command, to save round-trips to the database.
+        Pending items are also sent when the execution fails, so the
+        items fetched before the error are not lost. When an item
+        cannot be serialized or stored, the remaining ones are
+        discarded and the summary of the result only includes those
+        items that were stored, so the job can be resumed from there.
+
+        Items are serialized with pickle, using a fixed protocol
+        that can be read by any of the supported versions of Python.
+
         When the parameter `fetch_from_archive` is set to `True`,
         items will be fetched from the archive assigned to this job.
 
@@ -148,19 +195,59 @@ class PercevalJob:
         :param backend_args: parameters used to un the backend
         :param archive_args: archive arguments
         """
+        # Perceval adds keys such as 'category' to the arguments
+        # when it fetches the items; copy them to keep the caller's
+        # dict unchanged
         args = backend_args.copy()
 
         if archive_args:
             self.initialize_archive_manager(archive_args['archive_path'])
 
-        self._result = JobResult(self.job_id, self.task_id,
-                                 self.backend, self.category)
+        # Reset the result only when the job was run before;
+        # the one created by the constructor is still empty
+        if self._big is not None:
+            self._result = JobResult(self.job_id, self.task_id,
+                                     self.backend, self.category)
 
         self._big = self._create_items_generator(args, archive_args)
 
-        for item in self._big.items:
-            self._metadata(item)
-            self.conn.rpush(self.qitems, pickle.dumps(item))
+        # Bounded, so fast backends do not fill the memory
+        # when Redis is slower than them
+        pending = queue.Queue(maxsize=2 * self.batch_size)
+        self._error = None
+        self._stored_summary = perceval.backend.Summary()
+
+        writer_th = threading.Thread(target=self._write_items,
+                                     args=(pending,))
+        writer_th.start()
+
+        # Names used for each item are bound to locals
+        # to avoid attribute lookups inside the loop
+        metadata = self._item_metadata
+        put = pending.put
+
+        try:
+            for item in self._big.items:
+                if self._error:
+                    break
+                # Add in place metadata such as the identifier of the
+                # job that generated the item or the version of Arthur.
+                # Items given already serialized are stored as they are.
+                if not isinstance(item, bytes):
+                    item.update(metadata)
+                put(item)
+        finally:
+            pending.put(None)
+            writer_th.join()
+
+            # Perceval also counts the items that were discarded
+            # by the writer, so the result must only include the
+            # stored ones to resume the job from the right point
+            if self._error:
+                self._result.summary = self._stored_summary
+
+        if self._error:
+            raise self._error
 
     def has_archiving(self):
         """Returns if the job supports items archiving"""
@@ -198,17 +285,59 @@ class PercevalJob:
                                                       fetch_archive=fetch_archive,
                                                       archived_after=archived_after)
 
-    def _metadata(self, item):
-        """Add metadata to an item.
+    def _write_items(self, pending):
+        """Serialize and write items to the Redis queue.
+
+        Items are read from `pending` until `None` is found. They
+        are serialized with pickle, out of the thread that fetches
+        them, unless they are `bytes` already. Then, they are sent
+        in batches of up to `batch_size` elements, using a single
+        RPUSH command for each batch; a batch is also sent when there
+        are no more items waiting in `pending`, so items reach Redis
+        as soon as possible with slow backends.
 
-        Method that adds in place metadata to Perceval items such as
-        the identifier of the job that generated it or the version of
-        the system.
+        The items successfully stored are added to `_stored_summary`;
+        items given as `bytes` are loaded for that purpose, although
+        they are stored as they are.
+        When serializing or storing the items fails, the error is
+        saved in `_error` and the remaining items are discarded.
 
-        :param item: an item generated by Perceval
+        :param pending: queue of items
         """
-        item['arthur_version'] = __version__
-        item['job_id'] = self.job_id
+        dumps = pickle.dumps
+        loads = pickle.loads
+        summary = self._stored_summary
+        items = []
+        batch = []
+
+        while True:
+            item = pending.get()
+
+            if item is not None and not self._error:
+                try:
+                    if isinstance(item, bytes):
+                        data = item
+                        item = loads(data)
+                    else:
+                        data = dumps(item, ITEMS_PICKLE_PROTOCOL)
+                    items.append(item)
+                    batch.append(data)
+                except Exception as e:
+                    self._error = e
+
+            if batch and (item is None or len(batch) == self.batch_size or pending.empty()):
+                try:
+                    self.conn.rpush(self.qitems, *batch)
+                except Exception as e:
+                    self._error = e
+                else:
+                    for stored in items:
+                        summary.update(stored)
+                items = []
+                batch = []
+
+            if item is None:
+                break
 
 
 def execute_perceval_job(backend, backend_args, qitems, task_id, category,
@@ -254,7 +383,6 @@ def execute_perceval_job(backend, backend_args, qitems, task_id, category,
     except AttributeError as e:
         raise e
     except Exception as e:
-        rq_job = rq.get_current_job()
         rq_job.meta['result'] = job.result
         rq_job.save_meta()
         logger.debug("Error running job %s (%s) - %s",
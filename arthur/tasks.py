@@ -31,12 +31,9 @@ from grimoirelab_toolkit.datetime import (InvalidDateError,
                                           str_to_datetime)
 from grimoirelab_toolkit.introspect import find_class_properties
 
-import perceval.backend
-import perceval.backends
-
 from .common import MAX_JOB_RETRIES, WAIT_FOR_QUEUING
 from .errors import AlreadyExistsError, NotFoundError
-from .utils import RWLock
+from .utils import RWLock, available_backends
 
 
 logger = logging.getLogger(__name__)
@@ -97,7 +94,7 @@ class Task:
     def __init__(self, task_id, backend, category, backend_args,
                  archiving_cfg=None, scheduling_cfg=None):
         try:
-            bklass = perceval.backend.find_backends(perceval.backends)[0][backend]
+            bklass = available_backends()[backend]
         except KeyError:
             raise NotFoundError(element=backend)
 
@@ -21,9 +21,13 @@
 #
 
 import datetime
+import functools
 import json
 import threading
 
+import perceval.backend
+import perceval.backends
+
 
 class RWLock:
     """Read Write lock to avoid starvation.
@@ -89,3 +93,17 @@ class JSONEncoder(json.JSONEncoder):
     def iterencode(self, o, _one_shot=False):
         for chunk in super().iterencode(o, _one_shot=_one_shot):
             yield chunk
+
+
+@functools.lru_cache(maxsize=None)
+def available_backends():
+    """Get the backends available in Perceval.
+
+    Looking for the backends requires to scan and import the modules
+    of `perceval.backends`, so the result is computed only once and
+    reused for the lifetime of the process.
+
+    :returns: a dict with the name of the backends as keys and
+        their classes as values
+    """
+    return perceval.backend.find_backends(perceval.backends)[0]
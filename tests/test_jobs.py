@@ -26,20 +26,25 @@ import os.path
 import pickle
 import shutil
 import tempfile
+import threading
 import unittest
+import unittest.mock
 
 import httpretty
+import redis
 import requests
 import rq
 from dateutil.tz import UTC
 
 from arthur import __version__
+from arthur.common import ITEMS_BATCH_SIZE
 from arthur.errors import NotFoundError
 from arthur.jobs import (JobResult,
                          PercevalJob,
                          execute_perceval_job)
-from grimoirelab_toolkit.datetime import datetime_utcnow
+from grimoirelab_toolkit.datetime import datetime_utcnow, unixtime_to_datetime
 from perceval.archive import ArchiveManager
+from perceval.backend import Summary
 
 from base import TestBaseRQ
 
@@ -211,6 +216,43 @@ class TestJobResult(unittest.TestCase):
         self.assertEqual(result.category, 'category')
         self.assertEqual(result.summary, None)
 
+    def test_pickle(self):
+        """Test whether a JobResult object can be pickled"""
+
+        result = JobResult('arthur-job-1234567890', 'mytask',
+                           'mock_backend', 'category')
+        result.summary = Summary()
+        result.summary.fetched = 2
+
+        self.assertFalse(hasattr(result, '__dict__'))
+
+        result = pickle.loads(pickle.dumps(result))
+
+        self.assertIsInstance(result, JobResult)
+        self.assertEqual(result.job_id, 'arthur-job-1234567890')
+        self.assertEqual(result.task_id, 'mytask')
+        self.assertEqual(result.backend, 'mock_backend')
+        self.assertEqual(result.category, 'category')
+        self.assertEqual(result.summary.fetched, 2)
+
+    def test_unpickle_legacy(self):
+        """Test whether a JobResult pickled before using slots can be loaded"""
+
+        # JobResult object pickled when the class had no slots
+        data = b'\x80\x02carthur.jobs\nJobResult\nq\x00)\x81q\x01}q\x02(X\x06\x00\x00\x00job_idq\x03' \
+            b'X\x15\x00\x00\x00arthur-job-1234567890q\x04X\x07\x00\x00\x00task_idq\x05' \
+            b'X\x06\x00\x00\x00mytaskq\x06X\x07\x00\x00\x00backendq\x07X\x03\x00\x00\x00gitq\x08' \
+            b'X\x08\x00\x00\x00categoryq\tX\x06\x00\x00\x00commitq\nX\x07\x00\x00\x00summaryq\x0bNub.'
+
+        result = pickle.loads(data)
+
+        self.assertIsInstance(result, JobResult)
+        self.assertEqual(result.job_id, 'arthur-job-1234567890')
+        self.assertEqual(result.task_id, 'mytask')
+        self.assertEqual(result.backend, 'git')
+        self.assertEqual(result.category, 'commit')
+        self.assertEqual(result.summary, None)
+
     def test_to_dict(self):
         """Test whether a JobResult object is converted to a dict"""
 
@@ -225,6 +267,40 @@ class TestJobResult(unittest.TestCase):
         d = result.to_dict()
         self.assertEqual(d, expected)
 
+    def test_to_dict_summary(self):
+        """Test whether a JobResult with a summary is converted to a dict"""
+
+        result = JobResult('arthur-job-1234567890', 'mytask',
+                           'mock_backend', 'category')
+
+        summary = Summary()
+        summary.fetched = 2
+        summary.skipped = 1
+        summary.min_updated_on = datetime.datetime(2011, 12, 8, 17, 58, 37, tzinfo=UTC)
+        summary.max_updated_on = datetime.datetime(2012, 8, 14, 17, 30, 13, tzinfo=UTC)
+        summary.last_updated_on = datetime.datetime(2012, 8, 14, 17, 30, 13, tzinfo=UTC)
+        summary.last_uuid = '1375b60d3c23ac9b81da92523e4144abc4489d4c'
+        summary.extras = {'acme': True}
+        result.summary = summary
+
+        expected = {
+            'job_id': 'arthur-job-1234567890',
+            'task_id': 'mytask',
+            'fetched': 2,
+            'skipped': 1,
+            'min_updated_on': 1323367117.0,
+            'max_updated_on': 1344965413.0,
+            'last_updated_on': 1344965413.0,
+            'last_uuid': '1375b60d3c23ac9b81da92523e4144abc4489d4c',
+            'min_offset': None,
+            'max_offset': None,
+            'last_offset': None,
+            'extras': {'acme': True}
+        }
+
+        d = result.to_dict()
+        self.assertEqual(d, expected)
+
 
 class TestPercevalJob(TestBaseRQ):
     """Unit tests for PercevalJob class"""
@@ -249,6 +325,7 @@ class TestPercevalJob(TestBaseRQ):
         self.assertEqual(job.category, 'commit')
         self.assertEqual(job.conn, self.conn)
         self.assertEqual(job.qitems, 'items')
+        self.assertEqual(job.batch_size, ITEMS_BATCH_SIZE)
         self.assertEqual(job.archive_manager, None)
 
         result = job.result
@@ -267,6 +344,14 @@ class TestPercevalJob(TestBaseRQ):
                             self.conn, 'items')
             self.assertEqual(e.exception.element, 'mock_backend')
 
+    def test_invalid_batch_size(self):
+        """Test if it raises an exception when the batch size is not valid"""
+
+        for batch_size in (0, -1, None):
+            with self.assertRaisesRegex(ValueError, "Batch size must be greater than 0"):
+                _ = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                                self.conn, 'items', batch_size=batch_size)
+
     def test_run(self):
         """Test run method using the Git backend"""
 
@@ -314,6 +399,166 @@ class TestPercevalJob(TestBaseRQ):
 
         self.assertEqual(commits, expected)
 
+    def test_run_batch_size(self):
+        """Test if items are stored in order when they are sent in batches"""
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items', batch_size=2)
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        job.run(args)
+
+        self.assertEqual(job.result.summary.fetched, 9)
+
+        commits = self.conn.lrange('items', 0, -1)
+        commits = [pickle.loads(c) for c in commits]
+        commits = [commit['data']['commit'] for commit in commits]
+
+        expected = ['456a68ee1407a77f3e804a30dff245bb6c6b872f',
+                    '51a3b654f252210572297f47597b31527c475fb8',
+                    'ce8e0b86a1e9877f42fe9453ede418519115f367',
+                    '589bb080f059834829a2a5955bebfd7c2baa110a',
+                    'c6ba8f7a1058db3e6b4bc6f1090e932b107605fb',
+                    'c0d66f92a95e31c77be08dc9d0f11a16715d1885',
+                    '7debcf8a2f57f86663809c58b5c07a398be7674c',
+                    '87783129c3f00d2c81a3a8e585eb86a47e39891a',
+                    'bc57a9209f096a130dcc5ba7089a8663f758a703']
+
+        self.assertEqual(commits, expected)
+
+    def test_run_twice(self):
+        """Test if the result is reset when the job is run again"""
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        job.run(args)
+
+        first_result = job.result
+        self.assertEqual(first_result.summary.fetched, 9)
+
+        args['gitpath'] = os.path.join(self.dir, 'data/git_log_empty.txt')
+        job.run(args)
+
+        result = job.result
+        self.assertIsNot(result, first_result)
+        self.assertEqual(result.job_id, 'arthur-job-1234567890')
+        self.assertEqual(result.summary.fetched, 0)
+        self.assertEqual(first_result.summary.fetched, 9)
+
+    def test_run_serialized_items(self):
+        """Test if items already serialized are stored as they are"""
+
+        raw_item = pickle.dumps({'uuid': '0123456789abcdef', 'job_id': 'arthur-job-0'})
+        big = unittest.mock.Mock(items=iter([raw_item, {'uuid': 'fedcba9876543210'}]))
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+
+        with unittest.mock.patch.object(job, '_create_items_generator',
+                                        return_value=big):
+            job.run({})
+
+        items = self.conn.lrange('items', 0, -1)
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0], raw_item)
+
+        item = pickle.loads(items[1])
+        self.assertEqual(item['uuid'], 'fedcba9876543210')
+        self.assertEqual(item['job_id'], 'arthur-job-1234567890')
+        self.assertEqual(item['arthur_version'], __version__)
+
+    def test_run_storage_error(self):
+        """Test if errors storing the items are raised"""
+
+        # Items cannot be pushed to a key that stores a string
+        self.conn.set('items', 'not a list')
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items', batch_size=2)
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        with self.assertRaises(redis.exceptions.ResponseError):
+            job.run(args)
+
+        self.assertEqual(self.conn.get('items'), b'not a list')
+        self.assertEqual(job.result.summary.fetched, 0)
+        self.assertEqual(job.result.summary.max_updated_on, None)
+
+    def test_run_storage_error_summary(self):
+        """Test if the summary only includes stored items when storing fails"""
+
+        rpush = self.conn.rpush
+        ncalls = 0
+
+        def failing_rpush(*args):
+            nonlocal ncalls
+            ncalls += 1
+            if ncalls > 1:
+                raise redis.exceptions.ConnectionError()
+            return rpush(*args)
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items', batch_size=2)
+        args = {
+            'uri': 'http://example.com/',
+            'gitpath': os.path.join(self.dir, 'data/git_log.txt')
+        }
+
+        with unittest.mock.patch.object(self.conn, 'rpush', side_effect=failing_rpush):
+            with self.assertRaises(redis.exceptions.ConnectionError):
+                job.run(args)
+
+        items = self.conn.lrange('items', 0, -1)
+        items = [pickle.loads(item) for item in items]
+        self.assertGreater(len(items), 0)
+
+        summary = job.result.summary
+        self.assertEqual(summary.fetched, self.conn.llen('items'))
+        self.assertEqual(summary.last_uuid, items[-1]['uuid'])
+        self.assertEqual(summary.max_updated_on,
+                         max(unixtime_to_datetime(item['updated_on']) for item in items))
+
+    def test_run_serialization_error_summary(self):
+        """Test if the summary only includes stored items when an item cannot be serialized"""
+
+        items = [
+            {'uuid': '0123456789abcdef', 'updated_on': 1344965413.0},
+            {'uuid': '123456789abcdef0', 'updated_on': 1344965414.0},
+            {'uuid': '23456789abcdef01', 'updated_on': 1344965415.0,
+             'data': threading.Lock()},
+            {'uuid': '3456789abcdef012', 'updated_on': 1344965416.0}
+        ]
+        big = unittest.mock.Mock(items=iter(items))
+
+        job = PercevalJob('arthur-job-1234567890', 'mytask', 'git', 'commit',
+                          self.conn, 'items')
+
+        with unittest.mock.patch.object(job, '_create_items_generator',
+                                        return_value=big):
+            with self.assertRaises(TypeError):
+                job.run({})
+
+        stored = self.conn.lrange('items', 0, -1)
+        stored = [pickle.loads(item)['uuid'] for item in stored]
+        self.assertListEqual(stored, ['0123456789abcdef', '123456789abcdef0'])
+
+        summary = job.result.summary
+        self.assertEqual(summary.fetched, 2)
+        self.assertEqual(summary.last_uuid, '123456789abcdef0')
+        self.assertEqual(summary.max_updated_on,
+                         datetime.datetime(2012, 8, 14, 17, 30, 14, tzinfo=UTC))
+
     def test_metadata(self):
         """Check if metadata parameters are correctly set"""
 
@@ -331,6 +576,10 @@ class TestPercevalJob(TestBaseRQ):
         job.run(args, archive_args)
 
         items = self.conn.lrange('items', 0, -1)
+
+        for item in items:
+            self.assertEqual(item[:2], b'\x80\x04')
+
         items = [pickle.loads(item) for item in items]
 
         for item in items:
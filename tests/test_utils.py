@@ -26,8 +26,13 @@ import json
 import threading
 import time
 import unittest
+import unittest.mock
 
-from arthur.utils import RWLock, JSONEncoder
+import perceval.backend
+import perceval.backends
+import perceval.backends.core.git
+
+from arthur.utils import RWLock, JSONEncoder, available_backends
 
 
 class RWLockThread(threading.Thread):
@@ -177,5 +182,34 @@ class TestJSONEncoder(unittest.TestCase):
         self.assertEqual(result, obj)
 
 
+class TestAvailableBackends(unittest.TestCase):
+    """Unit tests for available_backends function"""
+
+    def setUp(self):
+        available_backends.cache_clear()
+
+    def tearDown(self):
+        available_backends.cache_clear()
+
+    def test_available_backends(self):
+        """Check if the backends of Perceval are returned"""
+
+        backends = available_backends()
+
+        self.assertIsInstance(backends, dict)
+        self.assertEqual(backends['git'], perceval.backends.core.git.Git)
+
+    def test_cached_backends(self):
+        """Check if the backends are looked for only once"""
+
+        with unittest.mock.patch('perceval.backend.find_backends',
+                                 wraps=perceval.backend.find_backends) as mock_find:
+            backends = available_backends()
+            self.assertIs(available_backends(), backends)
+            self.assertIs(available_backends(), backends)
+
+        mock_find.assert_called_once_with(perceval.backends)
+
+
 if __name__ == "__main__":
     unittest.main()